@@ -2,111 +2,930 @@
 """
 MongoDB Index Auto-Deployment Script
 
-This script executes MongoDB shell (mongosh) JavaScript files to deploy indexes.
+This script deploys the indexes described by mongosh JavaScript files.
+Files made only of createIndex calls are applied directly through a single
+pymongo client; any other script is executed with MongoDB shell (mongosh).
 Connection credentials are read from environment variables for security.
 All operations are logged with proper error handling.
 """
 
 import os
+import re
+import json
 import sys
+import shutil
+import time
+import asyncio
 import subprocess
 import logging
-from datetime import datetime
+import logging.handlers
+import tempfile
+import threading
+from collections import deque
 from pathlib import Path
-from typing import List, Tuple
+from typing import Any, FrozenSet, List, NamedTuple, Optional, Tuple, Union
 
+from pymongo import IndexModel, MongoClient
+from pymongo.errors import ConnectionFailure, PyMongoError
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# Fix Windows console encoding for Unicode characters
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8', errors='replace')
+    sys.stderr.reconfigure(encoding='utf-8', errors='replace')
 
 # Create deployment_logs directory if it doesn't exist
 log_dir = Path('deployment_logs')
 log_dir.mkdir(exist_ok=True)
 
-# Configure logging
-log_file = log_dir / f'index_deployment_{datetime.now().strftime("%Y%m%d_%H%M%S")}.log'
+# Configure logging; file writes are buffered and flushed on errors and at exit
+log_file = log_dir / f'index_deployment_{time.strftime("%Y%m%d_%H%M%S")}.log'
+log_format = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+file_handler = logging.FileHandler(log_file, encoding='utf-8', delay=True)
+file_handler.setFormatter(logging.Formatter(log_format))
+buffered_file_handler = logging.handlers.MemoryHandler(capacity=1024, flushLevel=logging.ERROR, target=file_handler)
 logging.basicConfig(
     level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    format=log_format,
     handlers=[
         logging.StreamHandler(sys.stdout),
-        logging.FileHandler(log_file, encoding='utf-8')
+        buffered_file_handler
     ]
 )
 logger = logging.getLogger(__name__)
 
-# Fix Windows console encoding for Unicode characters
-if sys.platform == 'win32':
-    import io
-    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+# Skip collecting record attributes the log format does not use
+logging.logThreads = False
+logging.logProcesses = False
+logging.logMultiprocessing = False
+logging._srcfile = None
+
+# mongosh output lines carry their own script prefix on the console; the log file keeps the full format
+output_logger = logging.getLogger('mongosh.out')
+output_logger.propagate = False
+output_console_handler = logging.StreamHandler(sys.stdout)
+output_console_handler.setFormatter(logging.Formatter('%(message)s'))
+output_logger.addHandler(output_console_handler)
+output_logger.addHandler(buffered_file_handler)
+
+
+class IndexSpec(NamedTuple):
+    """A single createIndex call extracted from a JavaScript file."""
+
+    database: Optional[str]
+    collection: str
+    keys: dict
+    options: dict
+    try_blocks: Tuple[int, ...]
+    model: IndexModel
+
+    @property
+    def guarded(self) -> bool:
+        """Whether the call is inside a try block whose catch swallows its errors."""
+        return bool(self.try_blocks)
+
+
+class ScriptPlan(NamedTuple):
+    """A JavaScript file together with what is known about its targets."""
+
+    path: Path
+    specs: Optional[List[IndexSpec]]
+    targets: FrozenSet[Optional[Tuple[str, str]]]
+    source: str
+
+
+class ProcessResult(NamedTuple):
+    """Outcome of a command run with MongoIndexDeployer.run_streaming."""
+
+    returncode: int
+    stdout: str
+    stderr: str
+    markers: List[str]
+
+
+class ProcessTimeout(asyncio.TimeoutError):
+    """Raised by MongoIndexDeployer.run_streaming when a command does not finish in time."""
+
+    def __init__(self, markers: List[str]):
+        super().__init__()
+        self.markers = markers
+
+
+class _ScriptParseError(ValueError):
+    """Raised when a script uses JavaScript the index parser does not understand."""
+
+
+_IDENTIFIER_RE = re.compile(r'[A-Za-z_$][\w$]*')
+_WORD_RE = re.compile(r'[\w$]+')
+_NUMBER_RE = re.compile(r'-?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?')
+_SIBLING_DB_RE = re.compile(r'db\s*=\s*db\.getSiblingDB\s*\(')
+_CREATE_INDEX_RE = re.compile(r'db\s*\.\s*([A-Za-z_$][\w$]*)\s*\.\s*createIndex\s*\(')
+_GET_COLLECTION_RE = re.compile(r'db\s*\.\s*getCollection\s*\(')
+_CREATE_INDEX_CALL_RE = re.compile(r'\s*\.\s*createIndex\s*\(')
+_PRINT_RE = re.compile(r'print(?:json)?\s*\(')
+_TRY_RE = re.compile(r'try\s*\{')
+_CATCH_RE = re.compile(r'\}\s*catch\s*(?:\(\s*([A-Za-z_$][\w$]*)\s*\))?\s*\{')
+_ERROR_MESSAGE_RE = re.compile(r'\s*\.\s*message\b')
+_LITERALS = {'true': True, 'false': False, 'null': None}
+# Tokens that continue an expression on the next line, preventing automatic semicolon insertion
+_CONTINUING_WORDS = frozenset(['in', 'instanceof'])
+_ESCAPES = {'n': '\n', 't': '\t', 'r': '\r', 'b': '\b', 'f': '\f', 'v': '\v'}
+_BATCH_MARKER = '[deploy_indexes]'
+_BATCH_SCRIPT_TEMPLATE = """{{
+  const __deployIndexesDb = db;
+  print('{marker} start {index}');
+  try {{
+{source}
+;
+    print('{marker} ok {index}');
+  }} catch (e) {{
+    print('{marker} error {index} ' + e);
+  }} finally {{
+    db = __deployIndexesDb;
+  }}
+}}
+"""
+# createIndexes builds all indexes or none, so a failed merged command replays the original calls in order
+_MERGED_CREATE_INDEXES_TEMPLATE = (
+    "try {{ if (!db.runCommand({command}).ok) throw 0; }} catch (__deployIndexesError) {{ {statements} }}"
+)
+# Well below the Windows command line limit of 32767 characters
+_EVAL_MAX_BYTES = 8 * 1024
+_SCRIPT_PATH_RE = re.compile(r'\bload\s*\(|\b__(?:dirname|filename)\b')
+_OUTPUT_LINE_RE = re.compile(rb'^([ \t\r\f\v]*\S.*?)[ \t\r]*$', re.MULTILINE)
+_INDEX_SIGNATURE_IGNORED = frozenset(['key', 'name', 'v', 'ns', 'background'])
+_HEADER_DATABASE_RE = re.compile(r'^\s*//\s*Database:\s*(\S+)', re.MULTILINE)
+_HEADER_COLLECTIONS_RE = re.compile(r'^\s*//\s*Collections?:\s*(.+)$', re.MULTILINE)
+
+
+class _ScriptParser:
+    """
+    Minimal parser for index scripts.
+
+    Understands the subset of mongosh JavaScript used by index scripts:
+    ``db = db.getSiblingDB(...)``, ``db.<collection>.createIndex(keys, options)``
+    with literal arguments, ``print``/``printjson`` calls of string literals
+    and the caught error, and ``try``/``catch`` blocks around them. Anything
+    else raises ``_ScriptParseError``.
+    """
+
+    def __init__(self, source: str):
+        self.source = source
+        self.pos = 0
+
+    def parse(self) -> List[IndexSpec]:
+        specs = []
+        database = None
+        blocks = []
+        caught = []
+        try_blocks = []
+        try_count = 0
+
+        while True:
+            self._skip(statements=True)
+            if self.pos >= len(self.source):
+                break
+
+            if self._match(_TRY_RE):
+                blocks.append('try')
+                try_count += 1
+                try_blocks.append(try_count)
+            elif blocks and (match := self._match(_CATCH_RE)):
+                if blocks.pop() != 'try':
+                    raise _ScriptParseError("catch without try")
+                try_blocks.pop()
+                blocks.append('catch')
+                caught.append(match.group(1))
+            elif blocks and self.source.startswith('}', self.pos):
+                self.pos += 1
+                if blocks.pop() == 'try':
+                    raise _ScriptParseError("try without catch")
+                caught.pop()
+            elif self._match(_SIBLING_DB_RE):
+                database = self._parse_arguments()[0]
+                if not isinstance(database, str):
+                    raise _ScriptParseError("getSiblingDB expects a string")
+                self._expect_statement_end()
+            elif self._match(_PRINT_RE):
+                self._parse_print_arguments(caught)
+                self._expect_statement_end()
+            else:
+                collection = self._match_create_index()
+                if collection is None:
+                    raise _ScriptParseError(f"unsupported statement at offset {self.pos}")
+                if 'catch' in blocks:
+                    raise _ScriptParseError("createIndex inside catch block")
+                keys, options, model = self._parse_create_index_arguments()
+                self._expect_statement_end()
+                specs.append(IndexSpec(database, collection, keys, options, tuple(try_blocks), model))
+
+        if blocks:
+            raise _ScriptParseError("unterminated block")
+        return specs
+
+    def _match(self, pattern: re.Pattern) -> Optional[re.Match]:
+        match = pattern.match(self.source, self.pos)
+        if match:
+            self.pos = match.end()
+        return match
+
+    def _match_create_index(self) -> Optional[str]:
+        match = self._match(_CREATE_INDEX_RE)
+        if match:
+            return match.group(1)
+        if self._match(_GET_COLLECTION_RE):
+            collection = self._parse_arguments()[0]
+            if isinstance(collection, str) and self._match(_CREATE_INDEX_CALL_RE):
+                return collection
+            raise _ScriptParseError("unsupported getCollection usage")
+        return None
+
+    def _skip(self, statements: bool = False):
+        """Skip whitespace and comments (and empty statements if requested)."""
+        source = self.source
+        while self.pos < len(source):
+            char = source[self.pos]
+            if char.isspace() or (statements and char == ';'):
+                self.pos += 1
+            elif source.startswith('//', self.pos):
+                end = source.find('\n', self.pos)
+                self.pos = len(source) if end == -1 else end
+            elif source.startswith('/*', self.pos):
+                end = source.find('*/', self.pos + 2)
+                if end == -1:
+                    raise _ScriptParseError("unterminated comment")
+                self.pos = end + 2
+            else:
+                break
+
+    def _skip_string(self):
+        """Skip a string or template literal without interpreting its escapes."""
+        source = self.source
+        quote = source[self.pos]
+        pos = self.pos + 1
+        while pos < len(source):
+            char = source[pos]
+            if char == quote:
+                self.pos = pos + 1
+                return
+            if char == '\\':
+                pos += 2 if source.startswith('\r\n', pos + 1) else 1
+            elif quote == '`' and source.startswith('${', pos):
+                raise _ScriptParseError("template literal substitutions are not supported")
+            elif char == '\n' and quote != '`':
+                break
+            pos += 1
+        raise _ScriptParseError("unterminated string")
+
+    def _skip_statement_end(self) -> bool:
+        """
+        Check that the expression ending at the current position is a complete statement.
+
+        The expression must be followed on the same line by ``;`` (which is
+        consumed) or ``}``, or end the line without the next line continuing
+        it. Anything else, such as ``.then(...)`` or ``|| ...``, makes it part
+        of a larger expression.
+        """
+        source = self.source
+        pos = self.pos
+        while pos < len(source) and source[pos] in ' \t':
+            pos += 1
+        if pos >= len(source) or source[pos] == '}':
+            self.pos = pos
+            return True
+        if source[pos] == ';':
+            self.pos = pos + 1
+            return True
+        if source[pos] not in '\r\n':
+            return False
+
+        self.pos = pos
+        self._skip()
+        following = self.pos
+        self.pos = pos
+        if following >= len(source) or source[following] in '};\'"':
+            return True
+        word = _IDENTIFIER_RE.match(source, following)
+        return word is not None and word.group() not in _CONTINUING_WORDS
+
+    def _expect_statement_end(self):
+        if not self._skip_statement_end():
+            raise _ScriptParseError(f"expected end of statement at offset {self.pos}")
+
+    def _parse_print_arguments(self, caught: List[Optional[str]]):
+        """
+        Check a print argument list whose opening parenthesis was consumed.
+
+        Arguments may only concatenate string literals and the error bound by
+        an enclosing catch clause (or its ``message``), so that calls such as
+        ``printjson(db.c.createIndex(...))`` are left to mongosh.
+        """
+        while True:
+            self._skip()
+            if self.source.startswith(')', self.pos):
+                self.pos += 1
+                return
+            while True:
+                self._skip()
+                if self.pos < len(self.source) and self.source[self.pos] in '\'"`':
+                    self._parse_string()
+                else:
+                    match = _IDENTIFIER_RE.match(self.source, self.pos)
+                    if not match or match.group() not in caught:
+                        raise _ScriptParseError(f"unsupported print argument at offset {self.pos}")
+                    self.pos = match.end()
+                    self._match(_ERROR_MESSAGE_RE)
+                self._skip()
+                if not self.source.startswith('+', self.pos):
+                    break
+                self.pos += 1
+            if self.source.startswith(',', self.pos):
+                self.pos += 1
+            elif not self.source.startswith(')', self.pos):
+                raise _ScriptParseError(f"expected ')' at offset {self.pos}")
+
+    def _parse_create_index_arguments(self) -> Tuple[dict, dict, IndexModel]:
+        """
+        Parse the (keys, options) arguments of a createIndex call.
+
+        The keys must be a non-empty document of numeric or string index
+        types. JavaScript has a single number type, so integral values such
+        as ``1.0`` are read as integers. A ``key`` option, which IndexModel
+        would replace with the keys, and arguments pymongo's IndexModel
+        rejects raise ``_ScriptParseError``.
+        """
+        args = self._parse_arguments()
+        if not 1 <= len(args) <= 2 or not all(isinstance(a, dict) for a in args):
+            raise _ScriptParseError("createIndex expects (keys, options)")
+        keys = args[0]
+        if not keys:
+            raise _ScriptParseError("createIndex expects at least one key")
+        for name, value in keys.items():
+            if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+                raise _ScriptParseError(f"unsupported index type {value!r}")
+            if isinstance(value, float) and value.is_integer():
+                keys[name] = int(value)
+        options = args[1] if len(args) == 2 else {}
+        if 'key' in options:
+            raise _ScriptParseError("createIndex options must not contain 'key'")
+        try:
+            model = IndexModel(list(keys.items()), **options)
+        except (TypeError, ValueError) as e:
+            raise _ScriptParseError(f"invalid createIndex arguments: {e}") from e
+        return keys, options, model
+
+    def _parse_arguments(self) -> List[Any]:
+        """Parse a literal argument list whose opening parenthesis was consumed."""
+        return self._parse_sequence(')')
+
+    def _parse_sequence(self, closing: str) -> List[Any]:
+        items = []
+        while True:
+            self._skip()
+            if self.source.startswith(closing, self.pos):
+                self.pos += 1
+                return items
+            items.append(self._parse_value())
+            self._skip()
+            if self.source.startswith(',', self.pos):
+                self.pos += 1
+            elif not self.source.startswith(closing, self.pos):
+                raise _ScriptParseError(f"expected '{closing}' at offset {self.pos}")
+
+    def _parse_value(self) -> Any:
+        self._skip()
+        if self.pos >= len(self.source):
+            raise _ScriptParseError("unexpected end of script")
+        char = self.source[self.pos]
+        if char == '{':
+            self.pos += 1
+            return self._parse_object()
+        if char == '[':
+            self.pos += 1
+            return self._parse_sequence(']')
+        if char in '\'"':
+            return self._parse_string()
+        match = self._match(_NUMBER_RE)
+        if match:
+            text = match.group()
+            return float(text) if any(c in text for c in '.eE') else int(text)
+        match = _IDENTIFIER_RE.match(self.source, self.pos)
+        if match and match.group() in _LITERALS:
+            self.pos = match.end()
+            return _LITERALS[match.group()]
+        raise _ScriptParseError(f"unsupported value at offset {self.pos}")
+
+    def _parse_object(self) -> dict:
+        result = {}
+        while True:
+            self._skip()
+            if self.source.startswith('}', self.pos):
+                self.pos += 1
+                return result
+            if self.pos < len(self.source) and self.source[self.pos] in '\'"':
+                key = self._parse_string()
+            else:
+                match = self._match(_IDENTIFIER_RE)
+                if not match:
+                    raise _ScriptParseError(f"unsupported object key at offset {self.pos}")
+                key = match.group()
+            self._skip()
+            if not self.source.startswith(':', self.pos):
+                raise _ScriptParseError(f"expected ':' at offset {self.pos}")
+            self.pos += 1
+            result[key] = self._parse_value()
+            self._skip()
+            if self.source.startswith(',', self.pos):
+                self.pos += 1
+            elif not self.source.startswith('}', self.pos):
+                raise _ScriptParseError(f"expected '}}' at offset {self.pos}")
+
+    def _parse_string(self) -> str:
+        quote = self.source[self.pos]
+        if quote == '`':
+            raise _ScriptParseError("template literals are not supported")
+        chars = []
+        pos = self.pos + 1
+        while pos < len(self.source):
+            char = self.source[pos]
+            if char == quote:
+                self.pos = pos + 1
+                return ''.join(chars)
+            if char == '\\':
+                pos += 1
+                escaped = self.source[pos:pos + 1]
+                # Numeric, unicode and line continuation escapes are left to mongosh
+                if not escaped or escaped in 'ux\r\n\u2028\u2029' or escaped.isdigit():
+                    raise _ScriptParseError(f"unsupported escape sequence at offset {pos - 1}")
+                chars.append(_ESCAPES.get(escaped, escaped))
+            elif char == '\n':
+                break
+            else:
+                chars.append(char)
+            pos += 1
+        raise _ScriptParseError("unterminated string")
+
+
+class _StreamForwarder:
+    """
+    Splits a byte stream into lines and logs the non-empty ones.
+
+    The lines of each chunk read from the stream are logged as a single
+    record, built directly rather than through one logger call per line.
+    Each line is prefixed so that output of scripts running concurrently
+    can be told apart. Lines are kept as bytes and only decoded when they
+    are logged or returned.
+    """
+
+    def __init__(self, header: str, level: int, prefix: str, tail_lines: int = 100,
+                 marker: Optional[str] = None):
+        self.header = header
+        self.level = level
+        self.prefix = f'  [{prefix}] '.encode('utf-8')
+        self.marker = marker.encode('utf-8') if marker else None
+        self.markers = []
+        self.pending = b''
+        self.lines = deque(maxlen=tail_lines)
+        self.started = False
+
+    def feed(self, chunk: bytes):
+        """Log the complete lines of a chunk and keep the incomplete rest."""
+        data = self.pending + chunk
+        end = data.rfind(b'\n') + 1
+        self.pending = data[end:]
+        self._emit(data[:end])
+
+    def close(self):
+        """Log the final line if the stream did not end with a newline."""
+        if self.pending:
+            self._emit(self.pending)
+            self.pending = b''
+
+    def tail(self) -> str:
+        return b'\n'.join(self.lines).decode('utf-8', 'replace')
+
+    def _emit(self, data: bytes):
+        lines = [match.group(1) for match in _OUTPUT_LINE_RE.finditer(data)]
+        if not lines:
+            return
+        self.lines.extend(lines)
+        if self.marker:
+            self.markers.extend(line.decode('utf-8', 'replace') for line in lines if line.startswith(self.marker))
+        if not output_logger.isEnabledFor(self.level):
+            return
+        if not self.started:
+            logger.log(self.level, self.header)
+            self.started = True
+        message = b'\n'.join(self.prefix + line for line in lines).decode('utf-8', 'replace')
+        output_logger.handle(output_logger.makeRecord(output_logger.name, self.level, __file__, 0, message, None, None))
+
+
+def parse_index_script(source: str) -> Optional[List[IndexSpec]]:
+    """
+    Extract the createIndex calls from a mongosh JavaScript file.
+
+    Args:
+        source: JavaScript source code
+
+    Returns:
+        List of IndexSpec objects, or None if the script contains JavaScript
+        that has to be executed by mongosh
+    """
+    try:
+        return _ScriptParser(source).parse()
+    except _ScriptParseError as e:
+        logger.debug("Script is not a plain index script: %s", e)
+        return None
+
+
+def coalesce_create_index_calls(source: str) -> str:
+    """
+    Rewrite consecutive createIndex statements on one collection into a single command.
+
+    Only complete statements (a call followed by ``;``, a line break or
+    ``}``) that directly follow each other (separated by nothing but
+    whitespace) and that have literal arguments are merged into one
+    ``db.runCommand({createIndexes: ...})``, so the script's control flow
+    is left untouched. If the command fails the original statements are
+    executed instead, so indexes before a failing call are still created
+    and the failure surfaces as it would without merging. Comments, strings and template literals are skipped;
+    the script is left as is from the first construct that cannot be
+    skipped reliably, such as a regular expression.
+
+    Args:
+        source: JavaScript source code
+
+    Returns:
+        JavaScript source code with the merged statements
+    """
+    parser = _ScriptParser(source)
+    runs = []
+    run = None
+    statement_start = True
+
+    try:
+        while True:
+            parser._skip()
+            if parser.pos >= len(source):
+                break
+            start = parser.pos
+            char = source[start]
+
+            match = _CREATE_INDEX_RE.match(source, start) if statement_start else None
+            if match:
+                parser.pos = match.end()
+                try:
+                    _, _, model = parser._parse_create_index_arguments()
+                except _ScriptParseError:
+                    parser.pos = match.end()
+                    model = None
+                statement_start = model is not None and parser._skip_statement_end()
+                if not statement_start:
+                    run = None
+                    continue
+
+                collection = match.group(1)
+                if (run is not None and run['collection'] == collection
+                        and not source[run['end']:start].strip()):
+                    run['indexes'].append(model.document)
+                    run['end'] = parser.pos
+                else:
+                    run = {'collection': collection, 'start': start, 'end': parser.pos, 'indexes': [model.document]}
+                    runs.append(run)
+                continue
+
+            if char in '\'"`':
+                parser._skip_string()
+                statement_start = False
+            elif char == '/':
+                # A regular expression or a division; either way scanning stops here
+                break
+            elif word := _WORD_RE.match(source, start):
+                parser.pos = word.end()
+                statement_start = False
+            else:
+                parser.pos += 1
+                statement_start = char in ';{}'
+    except _ScriptParseError as e:
+        logger.debug("Stopped merging createIndex calls at offset %d: %s", parser.pos, e)
+
+    for run in reversed(runs):
+        if len(run['indexes']) < 2:
+            continue
+        command = json.dumps({'createIndexes': run['collection'], 'indexes': run['indexes']})
+        merged = _MERGED_CREATE_INDEXES_TEMPLATE.format(command=command, statements=source[run['start']:run['end']])
+        source = f"{source[:run['start']]}{merged}{source[run['end']:]}"
+
+    return source
+
+
+def uses_script_path(source: str) -> bool:
+    """
+    Check whether a script depends on being executed from its own file.
+
+    mongosh resolves relative load() paths and __dirname/__filename against
+    the file given with --file, so such scripts are neither rewritten nor
+    combined with others.
+
+    Args:
+        source: JavaScript source code
+
+    Returns:
+        bool: True if the script calls load() or uses __dirname or __filename
+    """
+    return _SCRIPT_PATH_RE.search(source) is not None
+
+
+def _batchable(plan: ScriptPlan) -> bool:
+    """Whether a planned script can share a mongosh process with its neighbours."""
+    return plan.specs is None and not uses_script_path(plan.source)
+
+
+def _canonical_json(value: Any) -> Union[bytes, str]:
+    """Serialize a value with sorted keys, using orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(value, default=str, option=orjson.OPT_SORT_KEYS)
+    return json.dumps(value, sort_keys=True, default=str)
+
+
+def index_signature(document: dict) -> Tuple[tuple, Union[bytes, str]]:
+    """
+    Build a comparable identity for an index definition.
+
+    The key pattern keeps its field order; options are compared regardless
+    of order. Fields the server adds or ignores are left out.
+
+    Args:
+        document: Index document as sent to createIndexes or returned by listIndexes
+
+    Returns:
+        Tuple of (key pattern items, canonical options)
+    """
+    options = {k: v for k, v in document.items() if k not in _INDEX_SIGNATURE_IGNORED}
+    return tuple(document['key'].items()), _canonical_json(options)
+
+
+def script_header_targets(source: str, default_database: str) -> FrozenSet[Optional[Tuple[str, str]]]:
+    """
+    Read the target collections declared in a script's header comments.
+
+    Scripts executed with mongosh cannot be inspected, so they may declare
+    their targets with ``// Database: <name>`` and ``// Collection: <name>``
+    (or ``// Collections: a, b``) comments.
+
+    Args:
+        source: JavaScript source code
+        default_database: Database used when no Database comment is present
+
+    Returns:
+        Set of (database, collection) pairs, or ``{None}`` if undeclared
+    """
+    collections = _HEADER_COLLECTIONS_RE.search(source)
+    if not collections:
+        return frozenset([None])
+    database = _HEADER_DATABASE_RE.search(source)
+    database = database.group(1) if database else default_database
+    return frozenset(
+        (database, name.strip()) for name in collections.group(1).split(',') if name.strip()
+    )
+
+
+def group_by_target(plans: List[ScriptPlan]) -> List[List[ScriptPlan]]:
+    """
+    Group scripts so that scripts sharing a target collection stay together.
+
+    Groups can be deployed concurrently; the scripts of a group keep their
+    alphabetical order and must run one after another. Scripts with unknown
+    targets all share one group.
+
+    Args:
+        plans: Script plans in execution order
+
+    Returns:
+        List of groups, each a list of plans in execution order
+    """
+    groups: List[Tuple[set, List[Tuple[int, ScriptPlan]]]] = []
+
+    for index, plan in enumerate(plans):
+        targets = set(plan.targets)
+        members = [(index, plan)]
+        for group in [g for g in groups if g[0] & targets]:
+            groups.remove(group)
+            targets |= group[0]
+            members.extend(group[1])
+        groups.append((targets, sorted(members, key=lambda member: member[0])))
+
+    return [[plan for _, plan in members] for _, members in groups]
+
+
+def deployment_stages(plans: List[ScriptPlan]) -> List[List[List[ScriptPlan]]]:
+    """
+    Split scripts into stages that are deployed one after another.
+
+    A script with unknown targets may touch any collection, so it acts as a
+    barrier: it runs after every script before it and before every script
+    after it, as in a strictly alphabetical deployment. Consecutive scripts
+    with unknown targets form one stage with a single group; the scripts
+    between barriers are split with group_by_target.
+
+    Args:
+        plans: Script plans in execution order
+
+    Returns:
+        List of stages, each a list of groups that can be deployed concurrently
+    """
+    stages = []
+    run: List[ScriptPlan] = []
+    for plan in plans:
+        if run and (None in plan.targets) != (None in run[-1].targets):
+            stages.append([run] if None in run[-1].targets else group_by_target(run))
+            run = []
+        run.append(plan)
+    if run:
+        stages.append([run] if None in run[-1].targets else group_by_target(run))
+    return stages
+
+
+class PreflightCache:
+    """
+    Remembers successful preflight checks between runs.
+
+    Entries are stored in a JSON file and expire after ``ttl`` seconds, so
+    repeated deployments skip starting mongosh just to probe it.
+    """
+
+    def __init__(self, path: Path, ttl: float = 600):
+        """
+        Initialize the preflight cache.
+
+        Args:
+            path: JSON file holding the cache entries
+            ttl: Seconds during which an entry is considered fresh
+        """
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[dict]:
+        """
+        Return the fresh entry stored under key, if any.
+
+        Args:
+            key: Cache key
+
+        Returns:
+            The stored entry, or None if missing or expired
+        """
+        entry = self._load().get(key)
+        if not isinstance(entry, dict) or time.time() - entry.get('checked_at', 0) > self.ttl:
+            return None
+        return entry
+
+    def put(self, key: str, **values: Any):
+        """
+        Store an entry, dropping expired ones.
+
+        Args:
+            key: Cache key
+            **values: JSON-serializable values to store with the entry
+        """
+        with self._lock:
+            now = time.time()
+            entries = {
+                k: v for k, v in self._load().items()
+                if isinstance(v, dict) and now - v.get('checked_at', 0) <= self.ttl
+            }
+            entries[key] = dict(values, checked_at=now)
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                tmp_path = self.path.with_suffix('.tmp')
+                tmp_path.write_text(json.dumps(entries), encoding='utf-8')
+                os.replace(tmp_path, self.path)
+            except OSError as e:
+                logger.debug("Cannot write preflight cache %s: %s", self.path, e)
+
+    def _load(self) -> dict:
+        try:
+            entries = json.loads(self.path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return {}
+        return entries if isinstance(entries, dict) else {}
 
 
 class MongoIndexDeployer:
-    """Handles MongoDB index deployment operations using mongosh."""
+    """Handles MongoDB index deployment operations using pymongo and mongosh."""
 
-    def __init__(self, connection_string: str):
+    def __init__(self, connection_string: str, max_parallel: int = 4):
         """
         Initialize the MongoDB Index Deployer.
 
         Args:
             connection_string: MongoDB connection string with credentials
+            max_parallel: Maximum number of scripts deployed concurrently
         """
         self.connection_string = connection_string
+        self.max_parallel = max_parallel
+        self.client = MongoClient(connection_string, maxPoolSize=16)
+        self._mongosh = shutil.which('mongosh')
+        self._mongosh_available: Optional[bool] = None
+        self._mongosh_lock = threading.Lock()
+        self.preflight_cache = PreflightCache(Path.home() / '.cache' / 'mongo_index_deployer' / 'preflight.json')
 
-    def check_mongosh_installed(self) -> bool:
+    def close(self):
+        """Close the MongoDB client and its connection pool."""
+        self.client.close()
+
+    def preflight(self, mongosh_required: bool = False) -> bool:
         """
-        Check if mongosh is installed and available.
+        Check the connection to the MongoDB cluster and, if needed, mongosh.
+
+        When mongosh is required a single mongosh invocation reports its
+        version and pings the cluster; otherwise the cluster is pinged
+        through the pymongo client. A successful mongosh check is cached for
+        the same mongosh binary, in which case only the pymongo ping runs.
+        The connection itself is never cached.
+
+        Args:
+            mongosh_required: Whether scripts have to be executed with mongosh
 
         Returns:
-            bool: True if mongosh is installed, False otherwise
+            bool: True if all checks passed, False otherwise
         """
-        try:
-            result = subprocess.run(
-                ['mongosh', '--version'],
-                capture_output=True,
-                text=True,
-                timeout=10
-            )
-            if result.returncode == 0:
-                version = result.stdout.strip()
-                logger.info(f"MongoDB Shell (mongosh) found: {version}")
-                return True
-            else:
-                logger.error("mongosh is installed but returned an error")
-                return False
-        except FileNotFoundError:
+        if not mongosh_required:
+            return self.ping()
+
+        if not self._mongosh:
+            self._mongosh_available = False
             logger.error("mongosh is not installed or not in PATH")
             logger.error("Please install MongoDB Shell: https://www.mongodb.com/docs/mongodb-shell/install/")
             return False
-        except Exception as e:
-            logger.error(f"Error checking mongosh installation: {e}")
-            return False
 
-    def test_connection(self) -> bool:
-        """
-        Test connection to MongoDB cluster.
+        mongosh_key = None
+        try:
+            mongosh_key = f"mongosh:{self._mongosh}:{os.stat(self._mongosh).st_mtime_ns}"
+        except OSError:
+            pass
+        cached = self.preflight_cache.get(mongosh_key) if mongosh_key else None
+        if cached:
+            logger.info(f"MongoDB Shell (mongosh) found: {cached.get('mongosh_version')} (cached)")
+            self._mongosh_available = True
+            return self.ping()
 
-        Returns:
-            bool: True if connection successful, False otherwise
-        """
         try:
-            logger.info("Testing connection to MongoDB cluster...")
+            logger.info("Testing connection to MongoDB cluster with mongosh...")
             result = subprocess.run(
-                ['mongosh', self.connection_string, '--quiet', '--eval', 'db.adminCommand("ping")'],
+                [self._mongosh, self.connection_string, '--quiet', '--eval',
+                 'print("VER:" + version()); print("PING:" + db.adminCommand("ping").ok)'],
                 capture_output=True,
                 text=True,
                 timeout=30
             )
-
-            if result.returncode == 0:
-                logger.info("Successfully connected to MongoDB cluster")
-                return True
-            else:
-                logger.error(f"Failed to connect to MongoDB: {result.stderr}")
-                return False
         except subprocess.TimeoutExpired:
             logger.error("Connection attempt timed out after 30 seconds")
             return False
-        except Exception as e:
-            logger.error(f"Unexpected error during connection test: {e}")
+        except (OSError, subprocess.SubprocessError) as e:
+            logger.error(f"Error running mongosh: {e}")
+            return False
+
+        version = ping = None
+        for line in result.stdout.splitlines():
+            if line.startswith('VER:'):
+                version = line[4:].strip()
+            elif line.startswith('PING:'):
+                ping = line[5:].strip()
+
+        self._mongosh_available = version is not None
+        if version is not None:
+            logger.info(f"MongoDB Shell (mongosh) found: {version}")
+        if result.returncode != 0 or ping != '1':
+            logger.error(f"Failed to connect to MongoDB: {result.stderr.strip()}")
+            return False
+
+        logger.info("Successfully connected to MongoDB cluster")
+        if mongosh_key:
+            self.preflight_cache.put(mongosh_key, mongosh_version=version)
+        return True
+
+    def ping(self) -> bool:
+        """
+        Ping the MongoDB cluster through the pymongo client.
+
+        Returns:
+            bool: True if the cluster answered, False otherwise
+        """
+        try:
+            logger.info("Testing connection to MongoDB cluster...")
+            self.client.admin.command('ping')
+        except PyMongoError as e:
+            logger.error(f"Failed to connect to MongoDB: {e}")
             return False
+        logger.info("Successfully connected to MongoDB cluster")
+        return True
 
     def find_js_files(self, directory: str) -> List[Path]:
         """
@@ -128,7 +947,12 @@ class MongoIndexDeployer:
                 logger.error(f"Path is not a directory: {directory}")
                 return []
 
-            js_files = sorted(dir_path.glob('*.js'))
+            with os.scandir(dir_path) as entries:
+                js_files = sorted(
+                    (Path(entry.path) for entry in entries
+                     if entry.name.endswith('.js') and entry.is_file()),
+                    key=lambda path: path.name
+                )
 
             if not js_files:
                 logger.warning(f"No .js files found in {directory}")
@@ -139,87 +963,494 @@ class MongoIndexDeployer:
                 logger.info(f"  - {js_file.name}")
 
             return js_files
-        except Exception as e:
+        except OSError as e:
             logger.error(f"Error scanning directory {directory}: {e}")
             return []
 
     def execute_js_file(self, js_file: Path) -> Tuple[bool, str]:
+        """
+        Deploy the indexes defined in a JavaScript file.
+
+        Plain index scripts are applied through the pymongo client; scripts
+        containing other JavaScript are executed with mongosh.
+
+        Args:
+            js_file: Path to the JavaScript file
+
+        Returns:
+            Tuple of (success: bool, output: str)
+        """
+        plan = self.plan_script(js_file)
+        if plan is None:
+            return False, f"Cannot read {js_file}"
+        return asyncio.run(self.execute_plan(plan))
+
+    def plan_script(self, js_file: Path) -> Optional[ScriptPlan]:
+        """
+        Read and parse a JavaScript file ahead of its execution.
+
+        Args:
+            js_file: Path to the JavaScript file
+
+        Returns:
+            ScriptPlan for the file, or None if it cannot be read
+        """
+        try:
+            source = js_file.read_text(encoding='utf-8')
+        except (OSError, UnicodeDecodeError) as e:
+            logger.error(f"Cannot read {js_file}: {e}")
+            return None
+
+        default_database = self.client.get_default_database('test').name
+        specs = parse_index_script(source)
+        if specs is None:
+            targets = script_header_targets(source, default_database)
+        else:
+            targets = frozenset((spec.database or default_database, spec.collection) for spec in specs)
+
+        return ScriptPlan(js_file, specs, targets, source)
+
+    async def execute_plan(self, plan: ScriptPlan) -> Tuple[bool, str]:
+        """
+        Deploy the indexes of a planned JavaScript file.
+
+        The blocking pymongo calls run in a worker thread so the event loop
+        keeps serving other scripts.
+
+        Args:
+            plan: ScriptPlan returned by plan_script
+
+        Returns:
+            Tuple of (success: bool, output: str)
+        """
+        logger.info("=" * 80)
+        logger.info(f"Executing: {plan.path.name}")
+        logger.info("=" * 80)
+
+        if plan.specs is None:
+            logger.info(f"{plan.path.name} contains custom JavaScript, executing with mongosh")
+            return await self.execute_with_mongosh(plan.path, plan.source)
+
+        return await asyncio.to_thread(self.apply_index_specs, plan.path, plan.specs)
+
+    def apply_index_specs(self, js_file: Path, specs: List[IndexSpec]) -> Tuple[bool, str]:
+        """
+        Create the parsed indexes using the pymongo client.
+
+        Consecutive specs on the same collection form a batch, so indexes
+        are created in script order and none after the point where the
+        script would stop. The existing indexes of the collection are listed
+        first and indexes already present with the same key and options are
+        skipped; the remaining indexes of the batch are sent in a single
+        createIndexes command. If that command fails the indexes are retried
+        one by one so that failures of calls guarded by try/catch in the
+        script are logged as warnings and the rest of the innermost try
+        block is skipped, matching the behaviour of the script under
+        mongosh; an unguarded failure, or losing the connection, stops the
+        file.
+
+        Args:
+            js_file: Path to the JavaScript file the specs were parsed from
+            specs: Index specifications parsed from the file
+
+        Returns:
+            Tuple of (success: bool, output: str)
+        """
+        default_database = self.client.get_default_database('test').name
+        batches = []
+        for spec in specs:
+            namespace = (spec.database or default_database, spec.collection)
+            if not batches or batches[-1][0] != namespace:
+                batches.append((namespace, []))
+            batches[-1][1].append((spec, spec.model))
+
+        created = unchanged = 0
+        # try blocks left by a failure; their remaining specs are not executed
+        failed_blocks = set()
+        try:
+            for (database, collection), batch in batches:
+                batch = [(spec, model) for spec, model in batch if failed_blocks.isdisjoint(spec.try_blocks)]
+                if not batch:
+                    continue
+                existing = self.existing_index_signatures(database, collection)
+                pending = []
+                for spec, model in batch:
+                    if existing.get(model.document['name']) == index_signature(model.document):
+                        unchanged += 1
+                        logger.info(f"  = Index {model.document['name']} on {database}.{collection} is up to date")
+                    else:
+                        pending.append((spec, model))
+                batch = pending
+                if not batch:
+                    continue
+
+                if len(batch) > 1:
+                    try:
+                        self.create_indexes(database, collection, [model for _, model in batch])
+                        created += len(batch)
+                        for _, model in batch:
+                            logger.info(f"  ✓ Index {model.document['name']} on {database}.{collection}")
+                        continue
+                    except ConnectionFailure:
+                        raise
+                    except PyMongoError as e:
+                        logger.debug("createIndexes on %s.%s failed, retrying one by one: %s", database, collection, e)
+
+                for spec, model in batch:
+                    if not failed_blocks.isdisjoint(spec.try_blocks):
+                        continue
+                    name = model.document['name']
+                    try:
+                        self.create_indexes(database, collection, [model])
+                        created += 1
+                        logger.info(f"  ✓ Index {name} on {database}.{collection}")
+                    except ConnectionFailure:
+                        raise
+                    except PyMongoError as e:
+                        if spec.guarded:
+                            logger.warning(f"  Note: {name} on {database}.{collection} - {e}")
+                            failed_blocks.add(spec.try_blocks[-1])
+                            continue
+                        logger.error(f"✗ Failed to execute {js_file.name}: {name} on {database}.{collection} - {e}")
+                        return False, str(e)
+        except ConnectionFailure as e:
+            # A lost connection fails every remaining index, guarded or not
+            logger.error(f"✗ Failed to execute {js_file.name}: {e}")
+            return False, str(e)
+
+        logger.info(f"✓ Successfully executed {js_file.name}")
+        return True, f"{created} of {len(specs)} index(es) deployed, {unchanged} up to date"
+
+    def existing_index_signatures(self, database: str, collection: str) -> dict:
+        """
+        List the indexes of a collection.
+
+        Args:
+            database: Database name
+            collection: Collection name
+
+        Returns:
+            Dict mapping index names to their index_signature; empty if the
+            indexes cannot be listed
+
+        Raises:
+            ConnectionFailure: If the cluster cannot be reached
+        """
+        try:
+            return {
+                index['name']: index_signature(index)
+                for index in self.client[database][collection].list_indexes()
+            }
+        except ConnectionFailure:
+            raise
+        except PyMongoError as e:
+            logger.debug("Cannot list indexes of %s.%s: %s", database, collection, e)
+            return {}
+
+    def create_indexes(self, database: str, collection: str, models: List[IndexModel]):
+        """
+        Build several indexes of a collection with one createIndexes command.
+
+        Args:
+            database: Database name
+            collection: Collection name
+            models: Indexes to create
+
+        Raises:
+            PyMongoError: If the command fails
+        """
+        self.client[database].command({
+            'createIndexes': collection,
+            'indexes': [model.document for model in models],
+        })
+
+    async def execute_with_mongosh(self, js_file: Path, source: Optional[str] = None) -> Tuple[bool, str]:
         """
         Execute a JavaScript file using mongosh.
 
+        Consecutive createIndex calls on the same collection are merged into
+        one createIndexes command; the rewritten script is executed from a
+        temporary file. Scripts without such calls, and scripts that use
+        load(), __dirname or __filename, are passed to mongosh by path,
+        unchanged.
+
         Args:
             js_file: Path to the JavaScript file
+            source: Content of the file, if it was already read
 
         Returns:
             Tuple of (success: bool, output: str)
         """
+        if not await asyncio.to_thread(self._ensure_mongosh):
+            logger.error(f"✗ Cannot execute {js_file.name}: mongosh is required for custom JavaScript")
+            return False, "mongosh not available"
+
+        script_file = js_file
         try:
-            logger.info("=" * 80)
-            logger.info(f"Executing: {js_file.name}")
-            logger.info("=" * 80)
+            if source is None:
+                source = js_file.read_text(encoding='utf-8')
+            rewritten = source if uses_script_path(source) else coalesce_create_index_calls(source)
+            if rewritten != source:
+                with tempfile.NamedTemporaryFile('w', suffix='.js', encoding='utf-8', delete=False) as tmp:
+                    tmp.write(rewritten)
+                script_file = Path(tmp.name)
+                logger.debug("Merged consecutive createIndex calls of %s into %s", js_file.name, script_file)
 
             # Execute the JavaScript file using mongosh
             command = [
-                'mongosh',
+                self._mongosh,
                 self.connection_string,
                 '--quiet',
-                '--file', str(js_file)
+                '--file', str(script_file)
             ]
 
-            logger.debug(f"Executing command: mongosh <connection_string> --quiet --file {js_file}")
+            logger.debug("Executing command: mongosh <connection_string> --quiet --file %s", script_file)
 
-            result = subprocess.run(
-                command,
-                capture_output=True,
-                text=True,
-                timeout=300  # 5 minute timeout
-            )
-
-            output = result.stdout
-            error_output = result.stderr
-
-            # Log the output
-            if output:
-                logger.info("Script output:")
-                for line in output.strip().split('\n'):
-                    if line.strip():
-                        logger.info(f"  {line}")
-
-            if error_output:
-                logger.warning("Script errors/warnings:")
-                for line in error_output.strip().split('\n'):
-                    if line.strip():
-                        logger.warning(f"  {line}")
+            result = await self.run_streaming(command, timeout=300, label=js_file.name)  # 5 minute timeout
 
             if result.returncode == 0:
                 logger.info(f"✓ Successfully executed {js_file.name}")
-                return True, output
+                return True, result.stdout
             else:
                 logger.error(f"✗ Failed to execute {js_file.name} (exit code: {result.returncode})")
-                return False, error_output
+                return False, result.stderr
 
-        except subprocess.TimeoutExpired:
+        except asyncio.TimeoutError:
             logger.error(f"Execution of {js_file.name} timed out after 5 minutes")
             return False, "Timeout"
-        except FileNotFoundError:
-            logger.error(f"File not found: {js_file}")
-            return False, "File not found"
-        except Exception as e:
-            logger.error(f"Unexpected error executing {js_file.name}: {e}", exc_info=True)
+        except (OSError, UnicodeDecodeError) as e:
+            logger.error(f"Cannot execute {js_file.name}: {e}")
             return False, str(e)
+        finally:
+            if script_file != js_file:
+                script_file.unlink(missing_ok=True)
+
+    async def execute_mongosh_batch(self, plans: List[ScriptPlan]) -> List[bool]:
+        """
+        Execute several JavaScript files with a single mongosh process.
+
+        Each script runs in its own block whose errors are caught and
+        reported through marker lines, so one failing script does not stop
+        the next and every script still gets its own result. The combined
+        script is passed with --eval, or through a temporary file when it is
+        larger than 8KB or the command line is rejected by the system.
+        A script that ends the process itself, for example with quit(),
+        succeeds if the exit code is 0, as it would with mongosh --file.
+        Scripts the process never reached (after such a script, or after a
+        syntax error in the combined script) are executed on their own. If
+        the process times out, the scripts that already reported their result
+        keep it; the running script and those never reached fail.
+
+        Args:
+            plans: Plans of the JavaScript files, in execution order
+
+        Returns:
+            List with the success flag of each script
+        """
+        js_files = [plan.path for plan in plans]
+        names = ', '.join(js_file.name for js_file in js_files)
+        logger.info("=" * 80)
+        logger.info(f"Executing with one mongosh process: {names}")
+        logger.info("=" * 80)
+
+        if not await asyncio.to_thread(self._ensure_mongosh):
+            logger.error(f"✗ Cannot execute {names}: mongosh is required for custom JavaScript")
+            return [False] * len(js_files)
+
+        results: List[Optional[bool]] = [None] * len(js_files)
+        script = ''.join(
+            _BATCH_SCRIPT_TEMPLATE.format(
+                marker=_BATCH_MARKER, index=index, source=coalesce_create_index_calls(plan.source)
+            )
+            for index, plan in enumerate(plans)
+        )
+
+        timeout = 300 * len(js_files)
+        label = f"{js_files[0].name}..{js_files[-1].name}"
+        timed_out = False
+        try:
+            if len(script.encode('utf-8')) > _EVAL_MAX_BYTES:
+                result = await self._run_batch_script(script, timeout, label, use_file=True)
+            else:
+                try:
+                    result = await self._run_batch_script(script, timeout, label, use_file=False)
+                except OSError as e:
+                    # E2BIG and similar: the command line was too long for the system
+                    logger.debug("Cannot pass %s with --eval, retrying through a file: %s", names, e)
+                    result = await self._run_batch_script(script, timeout, label, use_file=True)
+            markers, returncode = result.markers, result.returncode
+        except ProcessTimeout as e:
+            logger.error(f"Execution of {names} timed out")
+            markers, returncode, timed_out = e.markers, None, True
+        except OSError as e:
+            logger.error(f"Cannot execute {names}: {e}")
+            return [bool(success) for success in results]
+
+        started = set()
+        for line in markers:
+            fields = line[len(_BATCH_MARKER):].split(None, 2)
+            if len(fields) < 2 or not fields[1].isdigit() or int(fields[1]) >= len(js_files):
+                continue
+            status, index = fields[0], int(fields[1])
+            if status == 'start':
+                started.add(index)
+            elif status == 'ok':
+                results[index] = True
+                logger.info(f"✓ Successfully executed {js_files[index].name}")
+            elif status == 'error':
+                results[index] = False
+                detail = fields[2] if len(fields) > 2 else ''
+                logger.error(f"✗ Failed to execute {js_files[index].name}: {detail}")
+
+        for index, plan in enumerate(plans):
+            js_file = plan.path
+            if results[index] is not None:
+                continue
+            if timed_out:
+                if index in started:
+                    logger.error(f"✗ Failed to execute {js_file.name}: timed out")
+                else:
+                    logger.error(f"✗ Not executed {js_file.name}: an earlier script timed out")
+                results[index] = False
+            elif index in started and returncode == 0:
+                logger.info(f"✓ Successfully executed {js_file.name} (ended the mongosh process)")
+                results[index] = True
+            elif index in started:
+                logger.error(f"✗ Failed to execute {js_file.name} (exit code: {returncode})")
+                results[index] = False
+            else:
+                results[index], _ = await self.execute_with_mongosh(js_file, plan.source)
+
+        return results
+
+    async def _run_batch_script(self, script: str, timeout: float, label: str, use_file: bool) -> ProcessResult:
+        """Run a combined batch script with mongosh, via --eval or a temporary file."""
+        command = [self._mongosh, self.connection_string, '--quiet']
+        if not use_file:
+            return await self.run_streaming(command + ['--eval', script], timeout=timeout, label=label,
+                                            marker=_BATCH_MARKER)
+
+        with tempfile.NamedTemporaryFile('w', suffix='.js', encoding='utf-8', delete=False) as tmp:
+            tmp.write(script)
+        script_file = Path(tmp.name)
+        try:
+            return await self.run_streaming(command + ['--file', str(script_file)], timeout=timeout, label=label,
+                                            marker=_BATCH_MARKER)
+        finally:
+            script_file.unlink(missing_ok=True)
+
+    def _ensure_mongosh(self) -> bool:
+        """Check for mongosh once and remember the result."""
+        with self._mongosh_lock:
+            if self._mongosh_available is None:
+                self.preflight(mongosh_required=True)
+            return bool(self._mongosh_available)
+
+    async def run_streaming(self, command: List[str], timeout: float, label: str,
+                            marker: Optional[str] = None) -> ProcessResult:
+        """
+        Run a command, forwarding its output to the log as it is produced.
+
+        Only the last lines of each stream are kept in memory. Every
+        forwarded line is prefixed with the label, and stderr lines are
+        marked as such.
+
+        Args:
+            command: Command line to execute
+            timeout: Seconds after which the process is killed
+            label: Name of the script(s) the command executes
+            marker: Prefix of stdout lines to collect in ProcessResult.markers
+
+        Returns:
+            ProcessResult with the return code and the tail of each stream
+
+        Raises:
+            ProcessTimeout: If the process did not finish in time, with the
+                markers collected until then
+        """
+        out = _StreamForwarder(f"Script output of {label}:", logging.INFO, label, marker=marker)
+        err = _StreamForwarder(f"Script errors/warnings of {label}:", logging.WARNING, f"{label} stderr")
+
+        async def forward(stream: asyncio.StreamReader, forwarder: _StreamForwarder):
+            while True:
+                chunk = await stream.read(65536)
+                if not chunk:
+                    break
+                forwarder.feed(chunk)
+            forwarder.close()
+
+        proc = await asyncio.create_subprocess_exec(
+            *command,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(forward(proc.stdout, out), forward(proc.stderr, err), proc.wait()),
+                timeout
+            )
+        except BaseException as e:
+            if proc.returncode is None:
+                proc.kill()
+                await proc.wait()
+            if isinstance(e, asyncio.TimeoutError):
+                raise ProcessTimeout(out.markers) from e
+            raise
+
+        return ProcessResult(proc.returncode, out.tail(), err.tail(), out.markers)
+
+    async def execute_group(self, group: List[ScriptPlan], semaphore: asyncio.Semaphore) -> List[bool]:
+        """
+        Execute a group of scripts sharing target collections, in order.
+
+        Args:
+            group: Script plans in execution order
+            semaphore: Limits the number of groups running at the same time
+
+        Returns:
+            List with the success flag of each script
+        """
+        async with semaphore:
+            results = []
+            index = 0
+            while index < len(group):
+                # Consecutive mongosh scripts share one mongosh process, unless
+                # they need to run from their own file
+                batch = [group[index]]
+                while (_batchable(batch[-1]) and index + len(batch) < len(group)
+                       and _batchable(group[index + len(batch)])):
+                    batch.append(group[index + len(batch)])
+                if len(batch) > 1:
+                    results.extend(await self.execute_mongosh_batch(batch))
+                else:
+                    success, _ = await self.execute_plan(batch[0])
+                    results.append(success)
+                index += len(batch)
+            return results
+
+    async def _deploy_stages(self, stages: List[List[List[ScriptPlan]]]) -> List[bool]:
+        semaphore = asyncio.Semaphore(self.max_parallel)
+        results = []
+        for groups in stages:
+            stage_results = await asyncio.gather(*(self.execute_group(group, semaphore) for group in groups))
+            results.extend(success for group_results in stage_results for success in group_results)
+        return results
 
     def deploy_indexes(self, scripts_directory: str) -> bool:
         """
         Deploy all indexes by executing JavaScript files in the specified directory.
 
+        Scripts targeting different collections are deployed concurrently,
+        up to max_parallel at a time; scripts sharing a collection run in
+        alphabetical order. Scripts with unknown targets run on their own,
+        in alphabetical order with respect to all other scripts.
+
         Args:
             scripts_directory: Directory containing .js files to execute
 
         Returns:
             bool: True if all operations successful, False otherwise
         """
-        all_successful = True
-
         # Find all JavaScript files
         js_files = self.find_js_files(scripts_directory)
 
@@ -227,18 +1458,23 @@ class MongoIndexDeployer:
             logger.error("No JavaScript files found to execute")
             return False
 
-        # Execute each file in alphabetical order
+        plans = [self.plan_script(js_file) for js_file in js_files]
+        if not self.preflight(mongosh_required=any(plan.specs is None for plan in plans if plan is not None)):
+            logger.error("Failed to establish MongoDB connection")
+            return False
+
         successful_count = 0
-        failed_count = 0
+        failed_count = sum(1 for plan in plans if plan is None)
 
-        for js_file in js_files:
-            success, output = self.execute_js_file(js_file)
+        stages = deployment_stages([plan for plan in plans if plan is not None])
+        logger.debug("Deploying %d stage(s) of independent groups, up to %d groups at a time",
+                     len(stages), self.max_parallel)
 
-            if success:
-                successful_count += 1
-            else:
-                failed_count += 1
-                all_successful = False
+        results = asyncio.run(self._deploy_stages(stages))
+        successful_count += sum(results)
+        failed_count += len(results) - sum(results)
+
+        all_successful = failed_count == 0
 
         # Summary
         logger.info("=" * 80)
@@ -267,19 +1503,20 @@ def main():
     # Get scripts directory path
     scripts_directory = os.environ.get('INDEXES_DIRECTORY', 'indexes_to_deploy')
 
-    # Initialize deployer
-    deployer = MongoIndexDeployer(connection_string)
-
+    # Get the number of scripts deployed concurrently
     try:
-        # Check if mongosh is installed
-        if not deployer.check_mongosh_installed():
-            logger.error("MongoDB Shell (mongosh) is required but not found")
-            sys.exit(1)
+        max_parallel = int(os.environ.get('MONGODB_MAX_PARALLEL', '4'))
+    except ValueError:
+        max_parallel = 0
+    if max_parallel < 1:
+        logger.error("MONGODB_MAX_PARALLEL must be a positive integer")
+        sys.exit(1)
 
-        # Test MongoDB connection
-        if not deployer.test_connection():
-            logger.error("Failed to establish MongoDB connection")
-            sys.exit(1)
+    deployer = None
+
+    try:
+        # Initialize deployer
+        deployer = MongoIndexDeployer(connection_string, max_parallel)
 
         # Deploy indexes
         logger.info(f"Starting index deployment from directory: {scripts_directory}")
@@ -302,6 +1539,9 @@ def main():
     except Exception as e:
         logger.error(f"Fatal error during deployment: {e}", exc_info=True)
         sys.exit(1)
+    finally:
+        if deployer is not None:
+            deployer.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,76 @@
+"""Shared helpers for the deploy_indexes tests."""
+
+from pathlib import Path
+from types import SimpleNamespace
+
+from deploy_indexes import MongoIndexDeployer, ScriptPlan
+
+UNKNOWN = frozenset([None])
+
+
+def plan(name, *collections, source=''):
+    """Build a ScriptPlan targeting collections of 'db', or unknown targets if none are given."""
+    targets = frozenset(('db', collection) for collection in collections) if collections else UNKNOWN
+    return ScriptPlan(Path(name), [] if collections else None, targets, source)
+
+
+class FakeClient:
+    """Stands in for MongoClient, keeping the indexes of each collection in memory."""
+
+    def __init__(self, failures=None, list_error=None, ping_error=None):
+        self.indexes = {}
+        self.failures = failures or {}
+        self.list_error = list_error
+        self.ping_error = ping_error
+        self.commands = []
+        self.pings = 0
+        self.admin = SimpleNamespace(command=self._ping)
+
+    def get_default_database(self, default):
+        return SimpleNamespace(name=default)
+
+    def __getitem__(self, database):
+        return FakeDatabase(self, database)
+
+    def close(self):
+        pass
+
+    def _ping(self, command):
+        self.pings += 1
+        if self.ping_error:
+            raise self.ping_error
+        return {'ok': 1}
+
+
+def fake_deployer(test_case):
+    """Build a MongoIndexDeployer whose client is a FakeClient, closed when the test ends."""
+    deployer = MongoIndexDeployer('mongodb://localhost:27017/?serverSelectionTimeoutMS=1')
+    deployer.client.close()
+    deployer.client = FakeClient()
+    test_case.addCleanup(deployer.close)
+    return deployer
+
+
+class FakeDatabase:
+
+    def __init__(self, client, name):
+        self.client = client
+        self.name = name
+
+    def __getitem__(self, collection):
+        return SimpleNamespace(list_indexes=lambda: self._list_indexes(collection))
+
+    def _list_indexes(self, collection):
+        if self.client.list_error:
+            raise self.client.list_error
+        return list(self.client.indexes.get((self.name, collection), []))
+
+    def command(self, command):
+        collection = command['createIndexes']
+        names = [index['name'] for index in command['indexes']]
+        self.client.commands.append((self.name, collection, names))
+        for name in names:
+            if name in self.client.failures:
+                raise self.client.failures[name]
+        self.client.indexes.setdefault((self.name, collection), []).extend(command['indexes'])
+        return {'ok': 1}
@@ -0,0 +1,124 @@
+"""Tests for the creation of parsed indexes through the pymongo client."""
+
+import unittest
+from pathlib import Path
+
+from pymongo.errors import AutoReconnect, OperationFailure
+
+from deploy_indexes import index_signature, parse_index_script
+from tests import fake_deployer
+
+
+def guarded(*calls):
+    return ''.join(f"try {{\n  {call};\n}} catch (e) {{\n  print('Note: ' + e.message);\n}}\n" for call in calls)
+
+
+class ApplyIndexSpecsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.deployer = fake_deployer(self)
+        self.client = self.deployer.client
+
+    def apply(self, source):
+        success, _ = self.deployer.apply_index_specs(Path('script.js'), parse_index_script(source))
+        return success
+
+    def test_only_consecutive_calls_on_a_collection_are_batched(self):
+        source = "db.a.createIndex({x: 1});\ndb.a.createIndex({y: 1});\ndb.b.createIndex({z: 1});\n" \
+                 "db.a.createIndex({w: 1});\n"
+        self.assertTrue(self.apply(source))
+        self.assertEqual(self.client.commands, [
+            ('test', 'a', ['x_1', 'y_1']), ('test', 'b', ['z_1']), ('test', 'a', ['w_1']),
+        ])
+
+    def test_unguarded_failure_stops_before_later_calls_on_other_collections(self):
+        self.client.failures = {'y_1': OperationFailure('conflict')}
+        source = "db.a.createIndex({x: 1});\ndb.b.createIndex({y: 1});\ndb.a.createIndex({z: 1});\n"
+        self.assertFalse(self.apply(source))
+        self.assertEqual(self.client.commands, [('test', 'a', ['x_1']), ('test', 'b', ['y_1'])])
+
+    def test_indexes_up_to_date_are_skipped(self):
+        self.client.indexes[('test', 'a')] = [
+            {'v': 2, 'key': {'x': 1}, 'name': 'x_1'},
+            {'v': 2, 'key': {'y': 1}, 'name': 'y_1'},
+        ]
+        source = "db.a.createIndex({x: 1});\ndb.a.createIndex({y: 1}, {unique: true});\ndb.a.createIndex({z: 1});\n"
+        self.assertTrue(self.apply(source))
+        self.assertEqual(self.client.commands, [('test', 'a', ['y_1', 'z_1'])])
+
+    def test_failed_batch_is_retried_one_by_one(self):
+        self.client.failures = {'y_1': OperationFailure('conflict')}
+        self.assertTrue(self.apply(guarded("db.a.createIndex({x: 1})", "db.a.createIndex({y: 1})",
+                                           "db.a.createIndex({z: 1})")))
+        self.assertEqual(self.client.commands, [
+            ('test', 'a', ['x_1', 'y_1', 'z_1']), ('test', 'a', ['x_1']), ('test', 'a', ['y_1']),
+            ('test', 'a', ['z_1']),
+        ])
+
+    def test_guarded_failure_skips_the_rest_of_its_try_block(self):
+        self.client.failures = {'x_1': OperationFailure('conflict')}
+        source = "try {\n  db.a.createIndex({x: 1});\n  db.a.createIndex({y: 1});\n  db.b.createIndex({w: 1});\n" \
+                 "} catch (e) {\n  print(e);\n}\n" + guarded("db.a.createIndex({z: 1})")
+        self.assertTrue(self.apply(source))
+        self.assertEqual(self.client.commands, [
+            ('test', 'a', ['x_1', 'y_1']), ('test', 'a', ['x_1']), ('test', 'a', ['z_1']),
+        ])
+
+    def test_guarded_failure_skips_nested_try_blocks(self):
+        source = "try {\n  db.a.createIndex({x: 1});\n  try {\n    db.a.createIndex({y: 1});\n" \
+                 "  } catch (e) {\n    print(e);\n  }\n  db.a.createIndex({z: 1});\n} catch (e) {\n  print(e);\n}\n"
+        self.client.failures = {'x_1': OperationFailure('conflict')}
+        self.assertTrue(self.apply(source))
+        self.assertEqual(self.client.commands[1:], [('test', 'a', ['x_1'])])
+
+        # A failure in the inner block only skips the inner block
+        self.client.indexes.clear()
+        self.client.commands.clear()
+        self.client.failures = {'y_1': OperationFailure('conflict')}
+        self.assertTrue(self.apply(source))
+        self.assertEqual(self.client.commands[1:], [
+            ('test', 'a', ['x_1']), ('test', 'a', ['y_1']), ('test', 'a', ['z_1']),
+        ])
+
+    def test_unguarded_failure_stops_the_retry(self):
+        self.client.failures = {'y_1': OperationFailure('conflict')}
+        source = "db.a.createIndex({x: 1});\ndb.a.createIndex({y: 1});\ndb.a.createIndex({z: 1});\n"
+        self.assertFalse(self.apply(source))
+        self.assertEqual(self.client.commands, [
+            ('test', 'a', ['x_1', 'y_1', 'z_1']), ('test', 'a', ['x_1']), ('test', 'a', ['y_1']),
+        ])
+
+    def test_lost_connection_fails_guarded_calls(self):
+        self.client.failures = {'x_1': AutoReconnect('connection closed')}
+        self.assertFalse(self.apply(guarded("db.a.createIndex({x: 1})", "db.b.createIndex({y: 1})")))
+        self.assertEqual(self.client.commands, [('test', 'a', ['x_1'])])
+
+    def test_lost_connection_while_listing_indexes_fails(self):
+        self.client.list_error = AutoReconnect('connection closed')
+        self.assertFalse(self.apply(guarded("db.a.createIndex({x: 1})")))
+        self.assertEqual(self.client.commands, [])
+
+
+class ExistingIndexSignaturesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.deployer = fake_deployer(self)
+        self.client = self.deployer.client
+
+    def test_indexes_are_mapped_by_name(self):
+        index = {'v': 2, 'key': {'x': 1}, 'name': 'x_idx', 'unique': True}
+        self.client.indexes[('db', 'a')] = [index]
+        self.assertEqual(self.deployer.existing_index_signatures('db', 'a'), {'x_idx': index_signature(index)})
+
+    def test_listing_errors_give_no_indexes(self):
+        self.client.list_error = OperationFailure('not authorized')
+        self.assertEqual(self.deployer.existing_index_signatures('db', 'a'), {})
+
+    def test_lost_connection_is_raised(self):
+        self.client.list_error = AutoReconnect('connection closed')
+        with self.assertRaises(AutoReconnect):
+            self.deployer.existing_index_signatures('db', 'a')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,40 @@
+"""Tests for the split of scripts into concurrently deployed groups."""
+
+import unittest
+
+from deploy_indexes import deployment_stages, group_by_target
+from tests import plan
+
+
+def names(groups):
+    return [[p.path.name for p in group] for group in groups]
+
+
+class GroupByTargetTest(unittest.TestCase):
+
+    def test_scripts_sharing_a_collection_stay_together(self):
+        plans = [plan('01.js', 'users'), plan('02.js', 'orders'), plan('03.js', 'orders', 'users'),
+                 plan('04.js', 'products')]
+        self.assertEqual(names(group_by_target(plans)), [['01.js', '02.js', '03.js'], ['04.js']])
+
+
+class DeploymentStagesTest(unittest.TestCase):
+
+    def test_unknown_targets_act_as_barriers(self):
+        plans = [plan('01_users.js', 'users'), plan('02_orders.js', 'orders'), plan('50_migrate.js'),
+                 plan('60_users.js', 'users'), plan('99_cleanup.js')]
+        self.assertEqual(
+            [names(stage) for stage in deployment_stages(plans)],
+            [[['01_users.js'], ['02_orders.js']], [['50_migrate.js']], [['60_users.js']], [['99_cleanup.js']]],
+        )
+
+    def test_consecutive_unknown_targets_share_a_group(self):
+        plans = [plan('01.js'), plan('02.js'), plan('03.js', 'users')]
+        self.assertEqual(
+            [names(stage) for stage in deployment_stages(plans)],
+            [[['01.js', '02.js']], [['03.js']]],
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+"""Tests for the comparison of index definitions with existing indexes."""
+
+import unittest
+from unittest import mock
+
+import deploy_indexes
+from deploy_indexes import index_signature
+
+
+class IndexSignatureTest(unittest.TestCase):
+
+    def test_server_fields_are_ignored(self):
+        requested = {'key': {'email': 1}, 'name': 'email_idx', 'unique': True, 'background': True}
+        existing = {'v': 2, 'key': {'email': 1}, 'name': 'email_idx', 'unique': True, 'ns': 'db.users'}
+        self.assertEqual(index_signature(requested), index_signature(existing))
+
+    def test_option_order_does_not_matter(self):
+        first = {'key': {'a': 1}, 'name': 'a', 'unique': True, 'sparse': True,
+                 'partialFilterExpression': {'status': 'active', 'age': {'$gt': 18}}}
+        second = {'partialFilterExpression': {'age': {'$gt': 18}, 'status': 'active'},
+                  'sparse': True, 'name': 'a', 'unique': True, 'key': {'a': 1}}
+        self.assertEqual(index_signature(first), index_signature(second))
+
+    def test_key_order_matters(self):
+        self.assertNotEqual(
+            index_signature({'key': {'status': 1, 'lastLoginAt': -1}, 'name': 'i'}),
+            index_signature({'key': {'lastLoginAt': -1, 'status': 1}, 'name': 'i'}),
+        )
+
+    def test_key_direction_and_options_matter(self):
+        base = {'key': {'a': 1}, 'name': 'a'}
+        self.assertNotEqual(index_signature(base), index_signature({'key': {'a': -1}, 'name': 'a'}))
+        self.assertNotEqual(index_signature(base), index_signature(dict(base, unique=True)))
+        self.assertNotEqual(index_signature(dict(base, expireAfterSeconds=60)),
+                            index_signature(dict(base, expireAfterSeconds=3600)))
+
+    def test_without_orjson(self):
+        first = {'key': {'a': 1}, 'name': 'a', 'unique': True, 'sparse': True}
+        second = {'sparse': True, 'v': 2, 'unique': True, 'key': {'a': 1}, 'name': 'a'}
+        with mock.patch.object(deploy_indexes, 'orjson', None):
+            self.assertEqual(index_signature(first), index_signature(second))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+"""Tests for the mapping of a shared mongosh run back to its scripts."""
+
+import asyncio
+import sys
+import unittest
+from pathlib import Path
+
+from deploy_indexes import _BATCH_MARKER, ProcessResult, ProcessTimeout
+from tests import fake_deployer, plan
+
+
+def script(name):
+    return plan(name, source=f"db.a.dropIndex('{name}');\n")
+
+
+def markers(*events):
+    return [f"{_BATCH_MARKER} {event}" for event in events]
+
+
+class ExecuteMongoshBatchTest(unittest.TestCase):
+
+    def setUp(self):
+        self.deployer = fake_deployer(self)
+        self.deployer._mongosh = 'mongosh'
+        self.deployer._ensure_mongosh = lambda: True
+        self.commands = []
+        self.reruns = []
+
+    def run_batch(self, names, returncode, events):
+        async def run_streaming(command, timeout, label, marker=None):
+            self.commands.append(command)
+            if returncode is None:
+                raise ProcessTimeout(markers(*events))
+            return ProcessResult(returncode, '', '', markers(*events))
+
+        async def execute_with_mongosh(js_file, source=None):
+            self.reruns.append(js_file.name)
+            return True, ''
+
+        self.deployer.run_streaming = run_streaming
+        self.deployer.execute_with_mongosh = execute_with_mongosh
+        return asyncio.run(self.deployer.execute_mongosh_batch([script(name) for name in names]))
+
+    def test_each_script_gets_its_own_result(self):
+        results = self.run_batch(['a.js', 'b.js', 'c.js'], 0, [
+            'start 0', 'ok 0', 'start 1', 'error 1 Error: index not found', 'start 2', 'ok 2',
+        ])
+        self.assertEqual(results, [True, False, True])
+        self.assertEqual(self.reruns, [])
+        self.assertEqual(len(self.commands), 1)
+        self.assertIn('--eval', self.commands[0])
+
+    def test_scripts_never_reached_are_run_on_their_own(self):
+        # A syntax error in the combined script stops mongosh before any block runs
+        results = self.run_batch(['a.js', 'b.js'], 1, [])
+        self.assertEqual(results, [True, True])
+        self.assertEqual(self.reruns, ['a.js', 'b.js'])
+
+    def test_script_ending_the_process_with_exit_code_0_succeeds(self):
+        results = self.run_batch(['a.js', 'b.js', 'c.js'], 0, ['start 0', 'ok 0', 'start 1'])
+        self.assertEqual(results, [True, True, True])
+        self.assertEqual(self.reruns, ['c.js'])
+
+    def test_script_ending_the_process_with_an_error_fails(self):
+        results = self.run_batch(['a.js', 'b.js', 'c.js'], 3, ['start 0', 'ok 0', 'start 1'])
+        self.assertEqual(results, [True, False, True])
+        self.assertEqual(self.reruns, ['c.js'])
+
+    def test_unknown_markers_are_ignored(self):
+        results = self.run_batch(['a.js'], 0, ['start 0', 'ok 7', 'done', 'ok x', 'ok 0'])
+        self.assertEqual(results, [True])
+
+    def test_rejected_command_line_is_retried_through_a_file(self):
+        async def run_streaming(command, timeout, label, marker=None):
+            self.commands.append(command)
+            if '--eval' in command:
+                raise OSError(7, 'Argument list too long')
+            return ProcessResult(0, '', '', markers('start 0', 'ok 0', 'start 1', 'ok 1'))
+
+        self.deployer.run_streaming = run_streaming
+        results = asyncio.run(self.deployer.execute_mongosh_batch([script('a.js'), script('b.js')]))
+        self.assertEqual(results, [True, True])
+        self.assertEqual([command[3] for command in self.commands], ['--eval', '--file'])
+        self.assertFalse(Path(self.commands[1][4]).exists())
+
+    def test_timeout_keeps_the_results_reported_before_it(self):
+        results = self.run_batch(['a.js', 'b.js', 'c.js', 'd.js'], None, [
+            'start 0', 'ok 0', 'start 1', 'error 1 Error', 'start 2',
+        ])
+        self.assertEqual(results, [True, False, False, False])
+        self.assertEqual(self.reruns, [])
+
+    def test_missing_mongosh_fails_every_script(self):
+        self.deployer._ensure_mongosh = lambda: False
+        results = asyncio.run(self.deployer.execute_mongosh_batch([script('a.js'), script('b.js')]))
+        self.assertEqual(results, [False, False])
+
+
+class RunStreamingTest(unittest.TestCase):
+
+    def test_timeout_carries_the_markers_seen(self):
+        deployer = fake_deployer(self)
+        code = f"import time; print('{_BATCH_MARKER} ok 0', flush=True); time.sleep(30)"
+        with self.assertRaises(ProcessTimeout) as raised:
+            asyncio.run(deployer.run_streaming([sys.executable, '-c', code], timeout=2, label='t.js',
+                                               marker=_BATCH_MARKER))
+        self.assertEqual(raised.exception.markers, markers('ok 0'))
+
+
+if __name__ == '__main__':
+    unittest.main()
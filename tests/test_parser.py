@@ -0,0 +1,192 @@
+"""Tests for the index script parser and the createIndex rewriting."""
+
+import json
+import re
+import unittest
+from pathlib import Path
+
+from deploy_indexes import coalesce_create_index_calls, parse_index_script, uses_script_path
+
+INDEXES_DIRECTORY = Path(__file__).resolve().parent.parent / 'indexes_to_deploy'
+MERGED_COMMAND_RE = re.compile(r'db\.runCommand\((\{.*?\})\)\.ok')
+
+
+def merged_commands(source):
+    return [json.loads(command) for command in MERGED_COMMAND_RE.findall(source)]
+
+
+class ParseIndexScriptTest(unittest.TestCase):
+
+    def test_example_script(self):
+        source = (INDEXES_DIRECTORY / '01_users_indexes.js').read_text(encoding='utf-8')
+        specs = parse_index_script(source)
+        self.assertEqual(
+            [spec.options['name'] for spec in specs],
+            ['email_unique_idx', 'username_unique_idx', 'createdAt_desc_idx', 'status_lastLogin_idx'],
+        )
+        self.assertTrue(all(spec.database == 'production_db' for spec in specs))
+        self.assertTrue(all(spec.guarded for spec in specs))
+        self.assertEqual(specs[3].keys, {'status': 1, 'lastLoginAt': -1})
+
+    def test_create_index_call(self):
+        specs = parse_index_script("db.orders.createIndex({customerId: 1, 'created.at': -1}, {name: 'c_idx'});")
+        self.assertEqual(len(specs), 1)
+        self.assertIsNone(specs[0].database)
+        self.assertEqual(specs[0].collection, 'orders')
+        self.assertEqual(specs[0].keys, {'customerId': 1, 'created.at': -1})
+        self.assertEqual(specs[0].options, {'name': 'c_idx'})
+        self.assertFalse(specs[0].guarded)
+
+    def test_try_blocks(self):
+        specs = parse_index_script(
+            "try { db.a.createIndex({x: 1}); try { db.a.createIndex({y: 1}) } catch (e) {} } catch (e) {}\n"
+            "try { db.a.createIndex({z: 1}) } catch (e) {}\ndb.a.createIndex({w: 1})"
+        )
+        self.assertEqual([spec.try_blocks for spec in specs], [(1,), (1, 2), (3,), ()])
+
+    def test_get_collection(self):
+        specs = parse_index_script("db.getCollection('order-items').createIndex({sku: 'hashed'})")
+        self.assertEqual(specs[0].collection, 'order-items')
+        self.assertEqual(specs[0].keys, {'sku': 'hashed'})
+
+    def test_print_of_literals_and_caught_error(self):
+        source = """
+        print('start', "users");
+        try {
+          db.users.createIndex({email: 1});
+        } catch (err) {
+          print('Note: ' + err.message);
+          printjson(err);
+        }
+        """
+        self.assertEqual(len(parse_index_script(source)), 1)
+
+    def test_print_of_other_expressions_is_not_parsed(self):
+        for source in [
+            "printjson(db.orders.createIndex({b: 1}))",
+            "print(db.users.dropIndex('x'))",
+            "print(e.message)",
+            "try { db.a.createIndex({a: 1}) } catch (e) { print(error) }",
+            "print('count: ' + db.users.countDocuments())",
+            "print(`template`)",
+        ]:
+            with self.subTest(source=source):
+                self.assertIsNone(parse_index_script(source))
+
+    def test_string_escapes(self):
+        specs = parse_index_script(r"""db.a.createIndex({a: 1}, {name: 'it\'s\t"a"\\b\/c'})""")
+        self.assertEqual(specs[0].options['name'], 'it\'s\t"a"\\b/c')
+
+    def test_unsupported_string_escapes_are_not_parsed(self):
+        for escape in [r'\u00e9', r'\x41', r'\0', r'\1', '\\\n']:
+            with self.subTest(escape=escape):
+                self.assertIsNone(parse_index_script(f"db.a.createIndex({{a: 1}}, {{name: 'caf{escape}_idx'}})"))
+
+    def test_invalid_keys_are_not_parsed(self):
+        for keys in ['{}', '{a: null}', '{a: [1]}', '{a: {b: 1}}', '{a: true}', '{a: 1.5}']:
+            with self.subTest(keys=keys):
+                self.assertIsNone(parse_index_script(f"db.a.createIndex({keys})"))
+        self.assertIsNone(parse_index_script("db.a.createIndex({a: 1}, {keys: 1})"))
+
+    def test_key_option_is_not_parsed(self):
+        self.assertIsNone(parse_index_script("db.a.createIndex({a: 1}, {key: {b: 1}, name: 'a_idx'})"))
+
+    def test_integral_float_keys_are_integers(self):
+        specs = parse_index_script("db.a.createIndex({score: 1.0, at: -1e0}, {name: 'score_idx'})")
+        self.assertEqual(specs[0].keys, {'score': 1, 'at': -1})
+        self.assertEqual(specs[0].model.document, {'key': {'score': 1, 'at': -1}, 'name': 'score_idx'})
+
+    def test_other_statements_are_not_parsed(self):
+        for source in [
+            "db.a.dropIndex('x')",
+            "const name = 'a_idx'; db.a.createIndex({a: 1}, {name: name})",
+            "try { db.a.createIndex({a: 1}) }",
+            "try { db.a.createIndex({a: 1}) } catch (e) { db.a.createIndex({b: 1}) }",
+            "db.a.createIndex({a: 1}, {}, {})",
+            "db.a.createIndex({x: 1}) db.b.createIndex({y: 1})",
+            "db.a.createIndex({x: 1}).then(r => print(r))",
+            "db.a.createIndex({x: 1})\n  || print('z')",
+            "print('a') print('b')",
+            "db = db.getSiblingDB('app') db.a.createIndex({x: 1})",
+        ]:
+            with self.subTest(source=source):
+                self.assertIsNone(parse_index_script(source))
+
+
+class CoalesceCreateIndexCallsTest(unittest.TestCase):
+
+    def test_consecutive_calls_are_merged(self):
+        source = "db.a.createIndex({x: 1});\ndb.a.createIndex({y: -1}, {name: 'y_idx'});\n"
+        result = coalesce_create_index_calls(source)
+        self.assertEqual(merged_commands(result), [{
+            'createIndexes': 'a',
+            'indexes': [{'key': {'x': 1}, 'name': 'x_1'}, {'key': {'y': -1}, 'name': 'y_idx'}],
+        }])
+
+    def test_failed_merged_command_replays_the_original_calls(self):
+        calls = "db.a.createIndex({x: 1}); db.a.createIndex({y: 1}, {name: 'taken'});"
+        source = f"try {{ {calls} }} catch (e) {{ print('Note: ' + e.message); }}\n"
+        result = coalesce_create_index_calls(source)
+        self.assertEqual(len(merged_commands(result)), 1)
+        prefix, _, replay = result.partition('catch (__deployIndexesError) {')
+        self.assertTrue(prefix.startswith('try { try { if (!db.runCommand('))
+        self.assertEqual(replay, f" {calls} }} }} catch (e) {{ print('Note: ' + e.message); }}\n")
+
+    def test_calls_on_different_collections_are_kept(self):
+        source = "db.a.createIndex({x: 1});\ndb.b.createIndex({y: 1});\n"
+        self.assertEqual(coalesce_create_index_calls(source), source)
+
+    def test_invalid_keys_are_kept(self):
+        source = "db.a.createIndex({});\ndb.a.createIndex({a: null});\ndb.a.createIndex({a: [1]});\n"
+        self.assertEqual(coalesce_create_index_calls(source), source)
+
+    def test_calls_rejected_by_index_model_are_kept(self):
+        for source in [
+            "db.a.createIndex({a: 1.5});\ndb.a.createIndex({b: 1});\n",
+            "db.a.createIndex({a: 1}, {keys: 1});\ndb.a.createIndex({b: 1});\n",
+            "db.a.createIndex({a: 1}, {key: {b: 1}});\ndb.a.createIndex({b: 1});\n",
+        ]:
+            with self.subTest(source=source):
+                self.assertEqual(coalesce_create_index_calls(source), source)
+
+    def test_calls_without_semicolons_are_merged(self):
+        source = "{\n  db.a.createIndex({x: 1})\n  db.a.createIndex({y: 1}) }\n"
+        self.assertEqual(len(merged_commands(coalesce_create_index_calls(source))), 1)
+
+    def test_commented_out_calls_are_kept(self):
+        source = "// disabled: db.a.createIndex({x:1}); db.a.createIndex({y:1});\ndb.a.createIndex({z:1});\n"
+        self.assertEqual(coalesce_create_index_calls(source), source)
+        source = "/* db.a.createIndex({x:1}); */ db.a.createIndex({y:1}); // db.a.createIndex({z:1});\n"
+        self.assertEqual(coalesce_create_index_calls(source), source)
+
+    def test_calls_in_strings_are_kept(self):
+        for quote in '\'"`':
+            source = f"print({quote}db.a.createIndex({{x:1}}); db.a.createIndex({{y:1}});{quote});\n"
+            with self.subTest(quote=quote):
+                self.assertEqual(coalesce_create_index_calls(source), source)
+
+    def test_calls_continued_by_an_expression_are_kept(self):
+        for source in [
+            "db.a.createIndex({p:1});\ndb.a.createIndex({q:1}).then(r => print(r));\n",
+            "db.a.createIndex({p:1});\ndb.a.createIndex({q:1}) || print('z');\n",
+            "db.a.createIndex({p:1})\ndb.a.createIndex({q:1})\n  .then(r => print(r));\n",
+        ]:
+            with self.subTest(source=source):
+                self.assertEqual(coalesce_create_index_calls(source), source)
+
+
+class UsesScriptPathTest(unittest.TestCase):
+
+    def test_load_and_script_location_are_detected(self):
+        for source in ["load('helpers/common.js')", "print(__dirname)", "const f = __filename;"]:
+            with self.subTest(source=source):
+                self.assertTrue(uses_script_path(source))
+
+    def test_other_scripts(self):
+        for source in ["db.a.dropIndex('x')", "const payload = 1; print(__dirnames)"]:
+            with self.subTest(source=source):
+                self.assertFalse(uses_script_path(source))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+"""Tests for the preflight checks and their cache."""
+
+import json
+import os
+import subprocess
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from pymongo.errors import ServerSelectionTimeoutError
+
+from deploy_indexes import PreflightCache
+from tests import fake_deployer
+
+
+def completed(stdout, returncode=0, stderr=''):
+    return subprocess.CompletedProcess([], returncode, stdout, stderr)
+
+
+class PreflightTest(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+        self.deployer = fake_deployer(self)
+        self.client = self.deployer.client
+        self.deployer.preflight_cache = PreflightCache(self.directory / 'preflight.json')
+        self.mongosh = self.directory / 'mongosh'
+        self.mongosh.write_text('', encoding='utf-8')
+        self.deployer._mongosh = str(self.mongosh)
+
+    def preflight(self, stdout='VER:2.3.1\nPING:1\n', returncode=0):
+        with mock.patch('deploy_indexes.subprocess.run', return_value=completed(stdout, returncode)) as run:
+            result = self.deployer.preflight(mongosh_required=True)
+        return result, run.call_count
+
+    def test_without_mongosh_only_the_client_pings(self):
+        self.deployer._mongosh = None
+        self.assertTrue(self.deployer.preflight())
+        self.assertEqual(self.client.pings, 1)
+        self.client.ping_error = ServerSelectionTimeoutError('no servers')
+        self.assertFalse(self.deployer.preflight())
+
+    def test_missing_mongosh_fails(self):
+        self.deployer._mongosh = None
+        self.assertFalse(self.deployer.preflight(mongosh_required=True))
+        self.assertFalse(self.deployer._ensure_mongosh())
+
+    def test_successful_check_is_cached(self):
+        self.assertEqual(self.preflight(), (True, 1))
+        self.assertEqual(self.client.pings, 0)
+        self.assertEqual(self.preflight(), (True, 0))
+        self.assertEqual(self.client.pings, 1)
+        self.assertTrue(self.deployer._mongosh_available)
+
+    def test_cached_check_still_pings_the_cluster(self):
+        self.preflight()
+        self.client.ping_error = ServerSelectionTimeoutError('no servers')
+        self.assertEqual(self.preflight(), (False, 0))
+
+    def test_failed_ping_is_not_cached(self):
+        self.assertEqual(self.preflight('VER:2.3.1\n', returncode=1), (False, 1))
+        self.assertTrue(self.deployer._mongosh_available)
+        self.assertEqual(self.preflight(), (True, 1))
+
+    def test_changed_mongosh_binary_invalidates_the_cache(self):
+        self.preflight()
+        stat = self.mongosh.stat()
+        os.utime(self.mongosh, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        self.assertEqual(self.preflight(), (True, 1))
+
+
+class PreflightCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = Path(directory.name) / 'cache' / 'preflight.json'
+
+    def test_entries_are_stored_between_instances(self):
+        PreflightCache(self.path).put('key', mongosh_version='2.3.1')
+        entry = PreflightCache(self.path).get('key')
+        self.assertEqual(entry['mongosh_version'], '2.3.1')
+        self.assertIsNone(PreflightCache(self.path).get('other'))
+
+    def test_expired_entries_are_ignored_and_dropped(self):
+        self.path.parent.mkdir(parents=True)
+        self.path.write_text(json.dumps({'old': {'checked_at': time.time() - 3600}}), encoding='utf-8')
+        cache = PreflightCache(self.path, ttl=600)
+        self.assertIsNone(cache.get('old'))
+        cache.put('new')
+        self.assertEqual(set(json.loads(self.path.read_text(encoding='utf-8'))), {'new'})
+
+    def test_unreadable_file_is_empty(self):
+        self.path.parent.mkdir(parents=True)
+        for content in ['not json', '[1, 2]', '{"key": 1}']:
+            with self.subTest(content=content):
+                self.path.write_text(content, encoding='utf-8')
+                self.assertIsNone(PreflightCache(self.path).get('key'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,32 @@
+"""Tests for the forwarding of mongosh output lines."""
+
+import logging
+import unittest
+
+from deploy_indexes import _StreamForwarder
+
+
+class StreamForwarderTest(unittest.TestCase):
+
+    def forward(self, *chunks):
+        forwarder = _StreamForwarder("Script output:", logging.DEBUG, 'test.js', marker='[m]')
+        for chunk in chunks:
+            forwarder.feed(chunk)
+        forwarder.close()
+        return forwarder
+
+    def test_non_empty_lines_are_kept(self):
+        forwarder = self.forward(b'first\r\n\n   \n  indented  \n', b'split ', b'line\nlast')
+        self.assertEqual(forwarder.tail(), 'first\n  indented\nsplit line\nlast')
+
+    def test_lines_starting_with_control_whitespace_are_kept(self):
+        forwarder = self.forward(b'\r10%\r50%\n\x0cpage\n\x0bvertical\n\r\n')
+        self.assertEqual(forwarder.tail(), '\r10%\r50%\n\x0cpage\n\x0bvertical')
+
+    def test_marker_lines_are_collected(self):
+        forwarder = self.forward(b'[m] start 0\nother\n[m] ok 0\n')
+        self.assertEqual(forwarder.markers, ['[m] start 0', '[m] ok 0'])
+
+
+if __name__ == '__main__':
+    unittest.main()